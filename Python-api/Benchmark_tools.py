@@ -0,0 +1,422 @@
+import os
+import sys
+import json
+import time
+import random
+import itertools
+import asyncio
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import KnowledgeBase_runtime
+import Read_CSV
+import Script_particion_excel_to_csv as particion
+from KnowledgeBase_runtime import LocalHashEmbeddings, get_db, get_local_index, set_embedding
+from Local_vector_index import DTYPES, entero_no_negativo, export_from_chroma
+from Read_CSV import consultar_csv
+from Retrieve_knowledgeBase import retrieve_top_k
+from mcp_matplotlib import MatplotlibMCPServer
+
+# ---------------- CONFIG ----------------
+MESES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+         "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+MEDIDAS = ["New Business Policies", "Gross Written Premium", "Claims Paid",
+           "Loss Ratio", "Claim Frequency", "Lapsed Policies"]
+
+SEGMENTOS = ["Retail", "Corporate", "Broker", "Direct"]
+
+QUERIES_RETRIEVAL = [
+    "New Business Policies 2020",
+    "Loss Ratio total",
+    "Claims Paid by segment",
+    "Gross Written Premium YTD",
+]
+
+CONSULTAS_CSV = ["count", "describe", "head", "top", "sum", "sample"]
+
+CHART_TYPES = ["line", "bar", "scatter", "histogram", "pie"]
+
+
+# ---------------- SYNTHETIC DATA ----------------
+
+def _bloque_medida(rng, titulo, medida, anios):
+    """
+    Genera un bloque con la forma de los Excel de Data raw:
+    título, cabecera 'Measure', filas por año y segmento con las
+    columnas 3/4 dispersas, y una fila de total.
+    """
+    ancho = 5 + len(MESES) + 2
+    vacia = [None] * ancho
+
+    filas = []
+    filas.append(list(vacia))
+
+    fila = list(vacia)
+    fila[2] = titulo
+    filas.append(fila)
+
+    filas.append(list(vacia))
+
+    fila = list(vacia)
+    fila[5] = "Sales Month"
+    filas.append(fila)
+
+    fila = list(vacia)
+    fila[2] = "Measure"
+    fila[3] = "Segment"
+    fila[4] = "Inception"
+    for j, mes in enumerate(MESES):
+        fila[5 + j] = mes
+    fila[5 + len(MESES)] = "Total"
+    fila[6 + len(MESES)] = "YTD"
+    filas.append(fila)
+
+    fila = list(vacia)
+    fila[4] = "Year"
+    for j in range(len(MESES)):
+        fila[5 + j] = j + 1
+    filas.append(fila)
+
+    filas.append(list(vacia))
+
+    totales = [0] * len(MESES)
+    for i, anio in enumerate(anios):
+        for s, segmento in enumerate(SEGMENTOS):
+            fila = list(vacia)
+
+            # Columnas 3/4 dispersas: solo la primera fila de cada grupo
+            if i == 0 and s == 0:
+                fila[2] = medida
+            if s == 0:
+                fila[3] = segmento
+            else:
+                fila[3] = segmento if rng.random() < 0.3 else None
+
+            fila[4] = anio
+            valores = [rng.randint(0, 20000) for _ in MESES]
+            for j, v in enumerate(valores):
+                fila[5 + j] = v
+                totales[j] += v
+            fila[5 + len(MESES)] = sum(valores)
+            fila[6 + len(MESES)] = valores[0]
+            filas.append(fila)
+
+    fila = list(vacia)
+    fila[2] = f"{medida} Total"
+    for j, v in enumerate(totales):
+        fila[5 + j] = v
+    fila[5 + len(MESES)] = sum(totales)
+    filas.append(fila)
+
+    return filas
+
+
+def generar_workbook(ruta, n_hojas, n_bloques, n_anios, seed):
+    """
+    Escribe un Excel sintético con n_hojas pestañas de n_bloques medidas.
+    """
+    rng = random.Random(seed)
+    anios = list(range(2026 - n_anios + 1, 2027))
+
+    with pd.ExcelWriter(ruta, engine="openpyxl") as writer:
+        for h in range(n_hojas):
+            filas = []
+            for b in range(n_bloques):
+                medida = MEDIDAS[(h + b) % len(MEDIDAS)]
+                filas.extend(_bloque_medida(
+                    rng,
+                    titulo=f"Monthly Analysis - Sheet {h + 1}",
+                    medida=medida,
+                    anios=anios
+                ))
+
+            pd.DataFrame(filas).to_excel(
+                writer,
+                sheet_name=f"Sheet {h + 1}",
+                header=False,
+                index=False
+            )
+
+
+# ---------------- MEASUREMENT ----------------
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    idx = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[idx]
+
+
+def medir(nombre, func, repeticiones, unidades=1, preparar=None):
+    """
+    Ejecuta func `repeticiones` veces y devuelve latencias p50/p95,
+    throughput y pico de memoria Python (una pasada extra con tracemalloc,
+    para no penalizar los tiempos). `preparar` se ejecuta, sin medir,
+    antes de cada pasada.
+    """
+    latencias = []
+
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        t0 = time.perf_counter()
+        func()
+        latencias.append(time.perf_counter() - t0)
+
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    func()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(latencias)
+
+    return {
+        "stage": nombre,
+        "runs": repeticiones,
+        "units_per_run": unidades,
+        "throughput_per_s": (repeticiones * unidades) / total if total > 0 else None,
+        "p50_ms": _percentil(latencias, 50) * 1000,
+        "p95_ms": _percentil(latencias, 95) * 1000,
+        "mean_ms": total / repeticiones * 1000,
+        "peak_python_mem_kb": pico / 1024,
+    }
+
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS devuelve bytes, Linux kilobytes
+    return rss / 1024 if sys.platform == "darwin" else rss
+
+
+# ---------------- BENCHMARK ----------------
+
+# Estado global que run_benchmark redirige a su carpeta temporal
+_ENV_BENCHMARK = ("KB_PERSIST_DIRECTORY", "KB_LOCAL_INDEX_PATH", "KB_RETRIEVAL_BACKEND")
+
+
+def run_benchmark(n_hojas=3, n_bloques=4, n_anios=14, repeticiones=5, seed=42, k=10,
+                  indice_dtype="float32", indice_nlist=0):
+
+    resultados = []
+
+    rutas_originales = (particion.DATA_RAW_PATH, particion.DATA_PROCESSED_PATH, Read_CSV.DATA_PROCESSED_PATH)
+    env_original = {clave: os.environ.get(clave) for clave in _ENV_BENCHMARK}
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="kb_bench_") as tmp:
+
+            raw_path = os.path.join(tmp, "raw")
+            processed_path = os.path.join(tmp, "processed")
+            os.makedirs(raw_path)
+            os.makedirs(processed_path)
+
+            # Redirigir rutas y KB a la carpeta temporal, con embedder offline
+            particion.DATA_RAW_PATH = raw_path
+            particion.DATA_PROCESSED_PATH = processed_path
+            Read_CSV.DATA_PROCESSED_PATH = processed_path
+            os.environ["KB_LOCAL_INDEX_PATH"] = os.path.join(tmp, "local_index")
+            os.environ["KB_RETRIEVAL_BACKEND"] = "chroma"
+            embedding = LocalHashEmbeddings()
+
+            contador_kb = itertools.count()
+
+            def kb_nueva():
+                # Cada pasada escribe en una KB vacía (ya abierta, fuera de la medida)
+                os.environ["KB_PERSIST_DIRECTORY"] = os.path.join(tmp, f"kb_{next(contador_kb)}")
+                set_embedding(embedding)
+                get_db()
+
+            nombre_excel = "Synthetic_benchmark.xlsx"
+            generar_workbook(
+                os.path.join(raw_path, nombre_excel),
+                n_hojas, n_bloques, n_anios, seed
+            )
+
+            # -------- partir_excel (incluye escritura CSV + ingesta) --------
+            resultados.append(medir(
+                "partir_excel",
+                lambda: particion.partir_excel(nombre_excel),
+                repeticiones,
+                preparar=kb_nueva
+            ))
+
+            carpeta_csv = os.path.join(processed_path, "Synthetic_benchmark")
+            csvs = sorted(f for f in os.listdir(carpeta_csv) if f.endswith(".csv"))
+            partes = [
+                (os.path.join(carpeta_csv, f), pd.read_csv(os.path.join(carpeta_csv, f)))
+                for f in csvs
+            ]
+
+            # -------- ingesta con embedder falso --------
+            def ingestar():
+                db = get_db()
+                for ruta, df in partes:
+                    particion.ingest_dataframe_to_chroma(df=df, csv_path=ruta, db=db)
+
+            resultados.append(medir(
+                "ingest_dataframe_to_chroma",
+                ingestar,
+                repeticiones,
+                unidades=len(partes),
+                preparar=kb_nueva
+            ))
+
+            # -------- retrieve_top_k sobre un corpus fijo (una copia de cada parte) --------
+            kb_nueva()
+            ingestar()
+            total_documentos = get_db()._collection.count()
+
+            def recuperar():
+                for q in QUERIES_RETRIEVAL:
+                    retrieve_top_k(q, k=k)
+
+            resultados.append(medir(
+                "retrieve_top_k",
+                recuperar,
+                repeticiones,
+                unidades=len(QUERIES_RETRIEVAL)
+            ))
+
+            # -------- retrieve_top_k con el índice local (memmap) --------
+            export_from_chroma(get_db(), os.environ["KB_LOCAL_INDEX_PATH"], dtype=indice_dtype, nlist=indice_nlist)
+            os.environ["KB_RETRIEVAL_BACKEND"] = "local"
+
+            # Abrir el índice fuera de la medida, igual que kb_nueva con Chroma
+            get_local_index()
+
+            resultados.append(medir(
+                f"retrieve_top_k:local:{indice_dtype}",
+                recuperar,
+                repeticiones,
+                unidades=len(QUERIES_RETRIEVAL)
+            ))
+
+            os.environ["KB_RETRIEVAL_BACKEND"] = "chroma"
+
+            # -------- consultar_csv --------
+            csv_consulta = csvs[0]
+            columna = partes[0][1].columns[min(6, len(partes[0][1].columns) - 1)]
+            parametros = {"columna": columna, "n": 10}
+
+            for consulta in CONSULTAS_CSV:
+                resultados.append(medir(
+                    f"consultar_csv:{consulta}",
+                    lambda consulta=consulta: consultar_csv(csv_consulta, consulta, parametros),
+                    repeticiones
+                ))
+
+            # -------- create_chart --------
+            server = MatplotlibMCPServer()
+            rng = random.Random(seed)
+            etiquetas = MESES
+            valores = [rng.randint(0, 20000) for _ in etiquetas]
+
+            for chart_type in CHART_TYPES:
+                if chart_type in ("histogram", "pie"):
+                    data = {"values": valores, "labels": etiquetas}
+                else:
+                    data = {"x": etiquetas, "y": valores}
+
+                resultados.append(medir(
+                    f"create_chart:{chart_type}",
+                    lambda chart_type=chart_type, data=data: asyncio.run(server.create_chart({
+                        "chart_type": chart_type,
+                        "data": data,
+                        "title": "Benchmark"
+                    })),
+                    repeticiones
+                ))
+
+            # Soltar Chroma / índice local antes de borrar la carpeta temporal
+            KnowledgeBase_runtime.reset_runtime()
+
+    finally:
+        # Dejar rutas, variables de entorno y runtime como estaban antes de la llamada
+        particion.DATA_RAW_PATH, particion.DATA_PROCESSED_PATH, Read_CSV.DATA_PROCESSED_PATH = rutas_originales
+
+        for clave, valor in env_original.items():
+            if valor is None:
+                os.environ.pop(clave, None)
+            else:
+                os.environ[clave] = valor
+
+        KnowledgeBase_runtime.reset_runtime()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "sheets": n_hojas,
+                "blocks": n_bloques,
+                "years": n_anios,
+                "repeat": repeticiones,
+                "seed": seed,
+                "k": k,
+                "index_dtype": indice_dtype,
+                "index_nlist": indice_nlist,
+            },
+            "csv_parts": len(csvs),
+            "kb_documents": total_documentos,
+            "peak_rss_kb": _peak_rss_kb(),
+        },
+        "results": resultados,
+    }
+
+
+# ---------------- MAIN ----------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark de las herramientas Python (ingesta, RAG, CSV, gráficos)"
+    )
+
+    parser.add_argument("--sheets", type=int, default=3, help="Pestañas del Excel sintético")
+    parser.add_argument("--blocks", type=int, default=4, help="Bloques de medidas por pestaña")
+    parser.add_argument("--years", type=int, default=14, help="Años por bloque")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por etapa")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla para datos reproducibles")
+    parser.add_argument("--k", type=int, default=10, help="Top-K para retrieve_top_k")
+    parser.add_argument("--index-dtype", choices=DTYPES, default="float32", help="dtype del índice local")
+    parser.add_argument("--index-nlist", type=entero_no_negativo, default=0, help="Listas IVF del índice local (0 = exacta)")
+    parser.add_argument("--output", help="Fichero JSON de salida (por defecto stdout)")
+
+    args = parser.parse_args()
+
+    # Las herramientas imprimen progreso por stdout; se silencia para dejar solo el JSON
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        informe = run_benchmark(
+            n_hojas=args.sheets,
+            n_bloques=args.blocks,
+            n_anios=args.years,
+            repeticiones=args.repeat,
+            seed=args.seed,
+            k=args.k,
+            indice_dtype=args.index_dtype,
+            indice_nlist=args.index_nlist
+        )
+
+    salida = json.dumps(informe, ensure_ascii=False, indent=2)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(salida)
+    else:
+        print(salida)
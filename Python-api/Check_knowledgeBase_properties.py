@@ -1,43 +1,38 @@
-import os
-from dotenv import load_dotenv
-from langchain_chroma import Chroma
-from langchain_openai import AzureOpenAIEmbeddings
+from KnowledgeBase_runtime import get_db, get_local_index_path
 
-# Ruta fija a la carpeta de excels
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Ruta fija a la carpeta de knowledge base
-KNOWLEDGE_BASE_PATH = os.path.join(BASE_DIR, "Data", "KnowledgeBase")
-ENV_PATH = os.path.join(BASE_DIR, "env", ".env.playground.user")
+def count_embeddings():
 
-load_dotenv(ENV_PATH)
+    db = get_db()
 
-try:
-    embedding = AzureOpenAIEmbeddings(
-        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_key = os.getenv("SECRET_AZURE_OPENAI_API_KEY"),
-        azure_deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
-        chunk_size = 1,
-        check_embedding_ctx_length=False
-    )
-    print("Embedding cargado correctamente.")
+    total = db._collection.count()
 
-except Exception as e:
-    print(f"Error al cargar el embedding: {e}")
+    print(f"\n🔢 Número total de embeddings en la KB: {total}\n")
 
+    return total
 
-def count_embeddings():
 
-    db = Chroma(
-        persist_directory=KNOWLEDGE_BASE_PATH,
-        embedding_function=embedding
-    )
+def check_local_index(total_chroma: int):
+    """
+    Si existe el índice local, comprueba que tenga los mismos vectores que Chroma.
+    """
+    from Local_vector_index import check_sync, index_exists, read_index_meta
 
-    total = db._collection.count()
+    ruta = get_local_index_path()
 
-    print(f"\n🔢 Número total de embeddings en la KB: {total}\n")
+    if not index_exists(ruta):
+        return
+
+    meta = read_index_meta(ruta)
+    aviso = check_sync(meta, total_chroma)
+
+    if aviso:
+        print(aviso)
+    else:
+        print(f"✅ Índice local al día ({meta['count']} vectores, {meta['dtype']}) → {ruta}")
 
 
 # 🏁 MAIN
 if __name__ == "__main__":
-    count_embeddings()
\ No newline at end of file
+    total = count_embeddings()
+    check_local_index(total)
\ No newline at end of file
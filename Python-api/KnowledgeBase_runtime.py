@@ -0,0 +1,269 @@
+import os
+import sys
+import re
+import math
+import hashlib
+import threading
+from Tools_metrics import incr, span
+
+# Ruta fija a la carpeta raíz del proyecto
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Ruta fija a la carpeta de knowledge base
+KNOWLEDGE_BASE_PATH = os.path.join(BASE_DIR, "Data", "KnowledgeBase")
+LOCAL_INDEX_PATH = os.path.join(BASE_DIR, "Data", "KnowledgeBase_local")
+ENV_PATH = os.path.join(BASE_DIR, "env", ".env.playground.user")
+
+# Backend de embeddings por defecto ("azure" o "local"); se puede
+# cambiar con la variable de entorno KB_EMBEDDING_BACKEND.
+DEFAULT_EMBEDDING_BACKEND = "azure"
+LOCAL_EMBEDDING_DIM = 256
+
+# Backend de recuperación ("chroma" o "local", ver Local_vector_index.py);
+# se puede cambiar con la variable de entorno KB_RETRIEVAL_BACKEND.
+DEFAULT_RETRIEVAL_BACKEND = "chroma"
+DEFAULT_LOCAL_INDEX_NPROBE = 8
+RETRIEVAL_BACKENDS = ("chroma", "local")
+
+# Objetos pesados: se crean una sola vez por proceso, en el primer uso.
+# El lock evita que dos hilos (endpoints síncronos de FastAPI) los creen a la vez;
+# es reentrante porque get_db llama a get_embedding.
+_lock = threading.RLock()
+_env_loaded = False
+_embedding = None
+_db = None
+_local_index = None
+
+
+class LocalHashEmbeddings:
+    """
+    Embeddings deterministas y offline (feature hashing de tokens).
+
+    Implementa la misma interfaz que los Embeddings de LangChain
+    (embed_documents / embed_query), así que Chroma los acepta sin cambios.
+    Pensado para tests y benchmarks: no hace llamadas de red.
+    """
+
+    _TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, dim: int = LOCAL_EMBEDDING_DIM):
+        self.dim = dim
+
+    def _embed(self, text: str):
+        vector = [0.0] * self.dim
+
+        for token in self._TOKEN_RE.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            valor = int.from_bytes(digest, "little")
+            signo = 1.0 if (valor >> 63) & 1 else -1.0
+            vector[valor % self.dim] += signo
+
+        norma = math.sqrt(sum(v * v for v in vector))
+        if norma > 0:
+            vector = [v / norma for v in vector]
+
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class _InstrumentedEmbeddings:
+    """
+    Envuelve un embedding para medir sus llamadas con Tools_metrics.
+    """
+
+    def __init__(self, embedding):
+        self.embedding = embedding
+
+    def embed_documents(self, texts):
+        with span("embedding.embed_documents", texts=len(texts)):
+            vectores = self.embedding.embed_documents(texts)
+        incr("embedding.texts", len(texts))
+        return vectores
+
+    def embed_query(self, text):
+        with span("embedding.embed_query"):
+            return self.embedding.embed_query(text)
+
+
+def load_env():
+    """
+    Carga el fichero .env una sola vez por proceso.
+    """
+    global _env_loaded
+
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv(ENV_PATH)
+        _env_loaded = True
+
+
+def _build_azure_embedding():
+    from langchain_openai import AzureOpenAIEmbeddings
+
+    return AzureOpenAIEmbeddings(
+        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key = os.getenv("SECRET_AZURE_OPENAI_API_KEY"),
+        azure_deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
+        chunk_size = 1,
+        check_embedding_ctx_length=False
+    )
+
+
+def _build_local_embedding():
+    dim = int(os.getenv("KB_LOCAL_EMBEDDING_DIM", LOCAL_EMBEDDING_DIM))
+    return LocalHashEmbeddings(dim=dim)
+
+
+# Registro de backends: nombre → función que construye el embedding
+EMBEDDING_BACKENDS = {
+    "azure": _build_azure_embedding,
+    "local": _build_local_embedding,
+}
+
+
+def register_embedding_backend(name: str, factory):
+    """
+    Registra un backend de embeddings adicional (factory sin argumentos).
+    """
+    EMBEDDING_BACKENDS[name] = factory
+
+
+def get_persist_directory():
+    load_env()
+    return os.getenv("KB_PERSIST_DIRECTORY", KNOWLEDGE_BASE_PATH)
+
+
+def get_local_index_path():
+    load_env()
+    return os.getenv("KB_LOCAL_INDEX_PATH", LOCAL_INDEX_PATH)
+
+
+def get_local_index_nprobe():
+    load_env()
+    return int(os.getenv("KB_LOCAL_INDEX_NPROBE", DEFAULT_LOCAL_INDEX_NPROBE))
+
+
+def get_retrieval_backend():
+    load_env()
+    backend = os.getenv("KB_RETRIEVAL_BACKEND", DEFAULT_RETRIEVAL_BACKEND)
+
+    if backend not in RETRIEVAL_BACKENDS:
+        raise ValueError(
+            f"Backend de recuperación '{backend}' no soportado. "
+            f"Disponibles: {list(RETRIEVAL_BACKENDS)}"
+        )
+
+    return backend
+
+
+def get_embedding():
+    """
+    Devuelve el embedding del proceso, creándolo en la primera llamada.
+    """
+    global _embedding
+
+    if _embedding is not None:
+        return _embedding
+
+    with _lock:
+        if _embedding is None:
+            load_env()
+            backend = os.getenv("KB_EMBEDDING_BACKEND", DEFAULT_EMBEDDING_BACKEND)
+
+            if backend not in EMBEDDING_BACKENDS:
+                raise ValueError(
+                    f"Backend de embeddings '{backend}' no soportado. "
+                    f"Disponibles: {list(EMBEDDING_BACKENDS)}"
+                )
+
+            # Mensajes de estado a stderr: stdout es la respuesta que lee el agente
+            try:
+                _embedding = EMBEDDING_BACKENDS[backend]()
+                print("Embedding cargado correctamente.", file=sys.stderr)
+            except Exception as e:
+                print(f"Error al cargar el embedding: {e}", file=sys.stderr)
+                raise
+
+        return _embedding
+
+
+def set_embedding(embedding):
+    """
+    Fija el embedding del proceso (p. ej. uno falso en benchmarks).
+    Descarta la instancia de Chroma cacheada, que usaba el anterior.
+    """
+    global _embedding, _db
+
+    with _lock:
+        _embedding = embedding
+        _db = None
+
+
+def get_db():
+    """
+    Devuelve la instancia de Chroma del proceso, creándola en la primera llamada.
+    """
+    global _db
+
+    if _db is not None:
+        return _db
+
+    with _lock:
+        if _db is None:
+            # En un proceso por llamada el import domina el coste; se mide aparte
+            with span("kb.import_chroma"):
+                from langchain_chroma import Chroma
+
+            embedding = get_embedding()
+
+            try:
+                with span("kb.open_chroma"):
+                    _db = Chroma(
+                        persist_directory=get_persist_directory(),
+                        embedding_function=_InstrumentedEmbeddings(embedding)
+                    )
+                print("Chroma cargado correctamente.", file=sys.stderr)
+            except Exception as e:
+                print(f"Error al cargar chroma: {e}", file=sys.stderr)
+                raise
+
+        return _db
+
+
+def get_local_index():
+    """
+    Devuelve el índice vectorial local del proceso, abriéndolo en la primera llamada.
+    No abre Chroma: la comprobación de índice obsoleto se hace en
+    Local_vector_index.py compare y en Check_knowledgeBase_properties.py.
+    """
+    global _local_index
+
+    if _local_index is not None:
+        return _local_index
+
+    with _lock:
+        if _local_index is None:
+            from Local_vector_index import LocalVectorIndex
+
+            with span("kb.open_local_index"):
+                _local_index = LocalVectorIndex(get_local_index_path())
+
+        return _local_index
+
+
+def reset_runtime():
+    """
+    Olvida los objetos cacheados; el siguiente uso los vuelve a crear.
+    """
+    global _embedding, _db, _local_index
+
+    with _lock:
+        _embedding = None
+        _db = None
+        _local_index = None
@@ -0,0 +1,598 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+from Tools_metrics import span
+
+# ---------------- CONFIG ----------------
+DTYPES = ("float32", "float16", "int8")
+# nprobe por defecto; el configurado (KB_LOCAL_INDEX_NPROBE) lo resuelve
+# KnowledgeBase_runtime.get_local_index_nprobe() tras cargar el .env
+DEFAULT_NPROBE = 8
+KMEANS_ITERS = 15
+KMEANS_SAMPLE = 50000
+SEARCH_CHUNK = 65536
+
+# Ficheros del índice dentro de su carpeta de versión
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+CENTROIDS_FILE = "centroids.npy"
+IVF_ORDER_FILE = "ivf_order.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+DOC_OFFSETS_FILE = "doc_offsets.npy"
+
+INDEX_FILES = (
+    META_FILE, VECTORS_FILE, SCALES_FILE, CENTROIDS_FILE,
+    IVF_ORDER_FILE, IVF_OFFSETS_FILE, DOCUMENTS_FILE, DOC_OFFSETS_FILE,
+)
+
+# Cada build se escribe en una subcarpeta v-<timestamp>; CURRENT apunta a la
+# versión completa en uso y se sustituye de forma atómica con os.replace
+CURRENT_FILE = "CURRENT"
+VERSION_PREFIX = "v-"
+
+
+def _ficheros_indice(meta):
+    """
+    Ficheros que forman parte de un índice según su meta.json.
+    """
+    ficheros = [META_FILE, VECTORS_FILE, DOCUMENTS_FILE, DOC_OFFSETS_FILE]
+    if meta["dtype"] == "int8":
+        ficheros.append(SCALES_FILE)
+    if meta.get("nlist"):
+        ficheros.extend([CENTROIDS_FILE, IVF_ORDER_FILE, IVF_OFFSETS_FILE])
+    return ficheros
+
+
+def resolve_index_dir(path: str):
+    """
+    Carpeta con los ficheros de la versión en uso del índice en `path`.
+    Sin fichero CURRENT se asume el formato antiguo (ficheros en `path`).
+    """
+    puntero = os.path.join(path, CURRENT_FILE)
+
+    if os.path.exists(puntero):
+        with open(puntero, encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+
+    return path
+
+
+def index_exists(path: str):
+    return os.path.exists(os.path.join(resolve_index_dir(path), META_FILE))
+
+
+def read_index_meta(path: str):
+    with open(os.path.join(resolve_index_dir(path), META_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_sync(meta, total_chroma: int):
+    """
+    Devuelve un aviso si el índice no tiene los mismos vectores que Chroma
+    (partir_excel solo escribe en Chroma), o None si coinciden.
+    """
+    if meta["count"] == total_chroma:
+        return None
+
+    exportado = (meta.get("source") or {}).get("exported_at", "?")
+    return (
+        f"⚠️ El índice local tiene {meta['count']} vectores (exportado {exportado}) "
+        f"y Chroma {total_chroma}. Vuelve a exportarlo: python Local_vector_index.py export"
+    )
+
+
+def _validar_parametros(dtype, nlist):
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype '{dtype}' no soportado. Disponibles: {list(DTYPES)}")
+    if nlist < 0:
+        raise ValueError(f"nlist debe ser >= 0 (recibido {nlist})")
+
+
+def _normalizar(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+def _kmeans(vectores, nlist, seed=0):
+    """
+    K-means esférico sencillo (producto escalar) para las listas IVF.
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectores))
+    centroides = vectores[rng.choice(len(vectores), size=nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERS):
+        asignacion = np.argmax(vectores @ centroides.T, axis=1)
+
+        for c in range(nlist):
+            miembros = vectores[asignacion == c]
+            if len(miembros):
+                centroides[c] = miembros.mean(axis=0)
+
+        centroides = _normalizar(centroides)
+
+    return centroides.astype(np.float32)
+
+
+class _IndexWriter:
+    """
+    Escribe un índice por lotes en una carpeta temporal junto a `path` y,
+    al terminar, la publica como versión nueva cambiando CURRENT.
+    Si algo falla, el índice anterior sigue intacto.
+    """
+
+    def __init__(self, path, count, dtype="float32", nlist=0, extra_meta=None):
+        _validar_parametros(dtype, nlist)
+
+        os.makedirs(path, exist_ok=True)
+
+        self.path = path
+        self.count = int(count)
+        self.dtype = dtype
+        self.nlist = min(nlist, self.count)
+        self.extra_meta = extra_meta or {}
+
+        self.dir = tempfile.mkdtemp(prefix=".building-", dir=path)
+        self.filas = 0
+        self.vectors = None
+        self.scales = None
+        self.doc_offsets = []
+        self.docs = open(os.path.join(self.dir, DOCUMENTS_FILE), "wb")
+
+    def add(self, embeddings, documents, metadatas, ids):
+        vectores = np.asarray(embeddings, dtype=np.float32)
+        if len(vectores) == 0:
+            return
+
+        inicio, fin = self.filas, self.filas + len(vectores)
+        if fin > self.count:
+            raise RuntimeError(f"Se esperaban {self.count} vectores y llegaron al menos {fin}")
+
+        if self.vectors is None:
+            self.vectors = np.lib.format.open_memmap(
+                os.path.join(self.dir, VECTORS_FILE), mode="w+",
+                dtype=self.dtype, shape=(self.count, vectores.shape[1])
+            )
+            if self.dtype == "int8":
+                self.scales = np.lib.format.open_memmap(
+                    os.path.join(self.dir, SCALES_FILE), mode="w+",
+                    dtype=np.float32, shape=(self.count,)
+                )
+
+        vectores = _normalizar(vectores)
+
+        # -------- cuantización --------
+        if self.dtype == "int8":
+            escalas = np.abs(vectores).max(axis=1, initial=0.0) / 127.0
+            escalas[escalas == 0] = 1.0
+            self.vectors[inicio:fin] = np.round(vectores / escalas[:, None]).astype(np.int8)
+            self.scales[inicio:fin] = escalas
+        else:
+            self.vectors[inicio:fin] = vectores.astype(self.dtype)
+
+        # -------- documentos (jsonl + offsets para leer solo el top-k) --------
+        for i, (contenido, metadata) in enumerate(zip(documents, metadatas)):
+            self.doc_offsets.append(self.docs.tell())
+            linea = {
+                "id": ids[i] if ids else str(inicio + i),
+                "page_content": contenido,
+                "metadata": metadata or {},
+            }
+            self.docs.write((json.dumps(linea, ensure_ascii=False) + "\n").encode("utf-8"))
+
+        self.filas = fin
+
+    def _construir_ivf(self):
+        rng = np.random.default_rng(0)
+        muestra = np.sort(rng.choice(self.count, size=min(self.count, KMEANS_SAMPLE), replace=False))
+        centroides = _kmeans(_normalizar(np.asarray(self.vectors[muestra], dtype=np.float32)), self.nlist)
+
+        # Asignar todas las filas por bloques (la escala int8 no cambia el argmax)
+        asignacion = np.empty(self.count, dtype=np.int64)
+        for inicio in range(0, self.count, SEARCH_CHUNK):
+            fin = min(inicio + SEARCH_CHUNK, self.count)
+            bloque = np.asarray(self.vectors[inicio:fin], dtype=np.float32)
+            asignacion[inicio:fin] = np.argmax(bloque @ centroides.T, axis=1)
+
+        orden = np.argsort(asignacion, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(asignacion[orden], np.arange(self.nlist + 1)).astype(np.int64)
+
+        np.save(os.path.join(self.dir, CENTROIDS_FILE), centroides)
+        np.save(os.path.join(self.dir, IVF_ORDER_FILE), orden)
+        np.save(os.path.join(self.dir, IVF_OFFSETS_FILE), offsets)
+
+    def commit(self):
+        """
+        Completa la versión y la publica. Devuelve la ruta del índice.
+        """
+        if self.filas != self.count:
+            raise RuntimeError(f"Se esperaban {self.count} vectores y llegaron {self.filas}")
+
+        self.docs.close()
+
+        if self.vectors is None:
+            np.save(os.path.join(self.dir, VECTORS_FILE), np.zeros((0, 0), dtype=self.dtype))
+            if self.dtype == "int8":
+                np.save(os.path.join(self.dir, SCALES_FILE), np.zeros(0, dtype=np.float32))
+            dim = 0
+        else:
+            dim = self.vectors.shape[1]
+            self.vectors.flush()
+            if self.scales is not None:
+                self.scales.flush()
+
+        if self.nlist:
+            self._construir_ivf()
+
+        np.save(os.path.join(self.dir, DOC_OFFSETS_FILE), np.asarray(self.doc_offsets, dtype=np.int64))
+
+        meta = {"dtype": self.dtype, "count": self.count, "dim": int(dim), "nlist": int(self.nlist)}
+        meta.update(self.extra_meta)
+        with open(os.path.join(self.dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        self.vectors = self.scales = None
+
+        # -------- publicar: carpeta de versión + CURRENT atómico --------
+        anterior = resolve_index_dir(self.path)
+        version = f"{VERSION_PREFIX}{time.time_ns()}"
+        os.rename(self.dir, os.path.join(self.path, version))
+
+        puntero_tmp = os.path.join(self.path, CURRENT_FILE + ".tmp")
+        with open(puntero_tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(puntero_tmp, os.path.join(self.path, CURRENT_FILE))
+
+        self._limpiar(version, anterior)
+
+        return self.path
+
+    def _limpiar(self, version, anterior):
+        """
+        Borra versiones viejas, conservando la anterior por si un lector la
+        tiene abierta, y los ficheros del formato antiguo sin CURRENT.
+        """
+        conservar = {version, os.path.basename(anterior)}
+
+        for nombre in os.listdir(self.path):
+            ruta = os.path.join(self.path, nombre)
+            if nombre.startswith(VERSION_PREFIX) and nombre not in conservar:
+                shutil.rmtree(ruta, ignore_errors=True)
+            elif nombre in INDEX_FILES:
+                os.remove(ruta)
+
+    def abort(self):
+        self.docs.close()
+        self.vectors = self.scales = None
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class LocalVectorIndex:
+    """
+    Índice vectorial local: matriz NumPy en disco abierta con memmap,
+    opcionalmente cuantizada (float16 / int8) y con búsqueda exacta o IVF.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data_path = resolve_index_dir(path)
+
+        with open(os.path.join(self.data_path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.dtype = self.meta["dtype"]
+        self.count = self.meta["count"]
+        self.dim = self.meta["dim"]
+
+        self.vectors = np.load(os.path.join(self.data_path, VECTORS_FILE), mmap_mode="r")
+        self.doc_offsets = np.load(os.path.join(self.data_path, DOC_OFFSETS_FILE), mmap_mode="r")
+
+        self.scales = None
+        if self.dtype == "int8":
+            self.scales = np.load(os.path.join(self.data_path, SCALES_FILE), mmap_mode="r")
+
+        self.centroids = None
+        if self.meta.get("nlist"):
+            self.centroids = np.load(os.path.join(self.data_path, CENTROIDS_FILE))
+            self.ivf_order = np.load(os.path.join(self.data_path, IVF_ORDER_FILE), mmap_mode="r")
+            self.ivf_offsets = np.load(os.path.join(self.data_path, IVF_OFFSETS_FILE))
+
+    # ---------------- BUILD ----------------
+
+    @classmethod
+    def build(cls, path, embeddings, documents, metadatas, ids=None, dtype="float32", nlist=0):
+        """
+        Escribe un índice nuevo en `path` y lo devuelve abierto.
+        """
+        writer = _IndexWriter(path, count=len(embeddings), dtype=dtype, nlist=nlist)
+
+        try:
+            writer.add(embeddings, documents, metadatas, ids)
+            writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+
+        return cls(path)
+
+    # ---------------- SEARCH ----------------
+
+    def _scores(self, query, filas=None):
+        """
+        Producto escalar de la query con las filas indicadas (o todas, por bloques).
+        """
+        if filas is not None:
+            bloque = np.asarray(self.vectors[filas], dtype=np.float32)
+            scores = bloque @ query
+            if self.scales is not None:
+                scores *= self.scales[filas]
+            return scores
+
+        scores = np.empty(self.count, dtype=np.float32)
+        for inicio in range(0, self.count, SEARCH_CHUNK):
+            fin = min(inicio + SEARCH_CHUNK, self.count)
+            bloque = np.asarray(self.vectors[inicio:fin], dtype=np.float32)
+            scores[inicio:fin] = bloque @ query
+            if self.scales is not None:
+                scores[inicio:fin] *= self.scales[inicio:fin]
+        return scores
+
+    def search(self, query_vector, k: int = 10, nprobe: int = None):
+        """
+        Devuelve [(score, fila)] de los k vectores más similares (coseno).
+        Con IVF solo se recorren las `nprobe` listas más cercanas.
+        """
+        if self.count == 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norma = np.linalg.norm(query)
+        if norma > 0:
+            query = query / norma
+
+        filas = None
+        if self.centroids is not None:
+            nprobe = min(nprobe or DEFAULT_NPROBE, len(self.centroids))
+            listas = np.argsort(-(self.centroids @ query))[:nprobe]
+            filas = np.sort(np.concatenate([
+                self.ivf_order[self.ivf_offsets[c]:self.ivf_offsets[c + 1]] for c in listas
+            ]))
+
+        scores = self._scores(query, filas)
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        if filas is not None:
+            return [(float(scores[i]), int(filas[i])) for i in top]
+        return [(float(scores[i]), int(i)) for i in top]
+
+    def get_document(self, fila: int):
+        with open(os.path.join(self.data_path, DOCUMENTS_FILE), "rb") as f:
+            f.seek(int(self.doc_offsets[fila]))
+            return json.loads(f.readline().decode("utf-8"))
+
+    def similarity_search(self, query: str, k: int = 10, embedding=None, nprobe: int = None):
+        """
+        Misma forma que Chroma.similarity_search: devuelve Documents de LangChain.
+        """
+        from langchain_core.documents import Document
+
+        with span("local_index.embed_query"):
+            query_vector = embedding.embed_query(query)
+
+        with span("local_index.search", k=k, dtype=self.dtype, ivf=self.centroids is not None):
+            resultados = self.search(query_vector, k=k, nprobe=nprobe)
+
+        documentos = []
+        for _, fila in resultados:
+            doc = self.get_document(fila)
+            documentos.append(Document(
+                id=doc["id"],
+                page_content=doc["page_content"],
+                metadata=doc["metadata"]
+            ))
+
+        return documentos
+
+    def size_bytes(self):
+        return sum(
+            os.path.getsize(os.path.join(self.data_path, f))
+            for f in _ficheros_indice(self.meta)
+        )
+
+
+# ---------------- CHROMA EXPORT ----------------
+
+def export_from_chroma(db, path: str, dtype: str = "float32", nlist: int = 0):
+    """
+    Vuelca embeddings, documentos y metadatos de la colección de Chroma
+    a un índice local en `path`, paginando con limit/offset para no cargar
+    la colección entera en memoria. Guarda en meta.json el número de
+    vectores de Chroma al exportar, para detectar después si quedó obsoleto.
+    """
+    coleccion = db._collection
+    total = coleccion.count()
+    lote = coleccion._client.get_max_batch_size()
+
+    writer = _IndexWriter(
+        path, count=total, dtype=dtype, nlist=nlist,
+        extra_meta={
+            "source": {
+                "chroma_count": total,
+                "exported_at": datetime.now(timezone.utc).isoformat(),
+            }
+        }
+    )
+
+    try:
+        for offset in range(0, total, lote):
+            datos = coleccion.get(
+                limit=lote,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+
+            if not datos["ids"]:
+                raise RuntimeError("La colección de Chroma cambió durante la exportación")
+
+            writer.add(datos["embeddings"], datos["documents"], datos["metadatas"], datos["ids"])
+
+        writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+
+    return LocalVectorIndex(path)
+
+
+def import_to_chroma(index: LocalVectorIndex, db):
+    """
+    Carga un índice local en una colección de Chroma (vectores descuantizados),
+    por lotes que no superan el máximo que admite el cliente de Chroma.
+    """
+    lote = db._collection._client.get_max_batch_size()
+
+    with open(os.path.join(index.data_path, DOCUMENTS_FILE), "rb") as f:
+        for inicio in range(0, index.count, lote):
+            fin = min(inicio + lote, index.count)
+
+            vectores = np.asarray(index.vectors[inicio:fin], dtype=np.float32)
+            if index.scales is not None:
+                vectores = vectores * index.scales[inicio:fin, None]
+
+            docs = [json.loads(f.readline().decode("utf-8")) for _ in range(fin - inicio)]
+
+            db._collection.upsert(
+                ids=[doc["id"] for doc in docs],
+                embeddings=vectores,
+                documents=[doc["page_content"] for doc in docs],
+                metadatas=[doc["metadata"] or None for doc in docs]
+            )
+
+    return index.count
+
+
+# ---------------- COMPARE ----------------
+
+def compare_with_chroma(db, index: LocalVectorIndex, embedding, queries, k: int = 10, nprobe: int = None):
+    """
+    Compara latencia, tamaño y recall@k del índice local frente a Chroma.
+    """
+    lat_chroma, lat_local, recalls = [], [], []
+
+    total_chroma = db._collection.count()
+    aviso = check_sync(index.meta, total_chroma)
+    if aviso:
+        print(aviso, file=sys.stderr)
+
+    for query in queries:
+        query_vector = embedding.embed_query(query)
+
+        t0 = time.perf_counter()
+        esperados = db._collection.query(query_embeddings=[query_vector], n_results=k)["ids"][0]
+        lat_chroma.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        resultados = index.search(query_vector, k=k, nprobe=nprobe)
+        lat_local.append(time.perf_counter() - t0)
+
+        obtenidos = {index.get_document(fila)["id"] for _, fila in resultados}
+        if esperados:
+            recalls.append(len(obtenidos & set(esperados)) / len(esperados))
+
+    def _ms(valores, p):
+        return float(np.percentile(valores, p) * 1000) if valores else None
+
+    return {
+        "queries": len(queries),
+        "k": k,
+        "dtype": index.dtype,
+        "nlist": index.meta.get("nlist", 0),
+        "nprobe": nprobe or (DEFAULT_NPROBE if index.centroids is not None else None),
+        "count": index.count,
+        "chroma_count": total_chroma,
+        "exported_at": (index.meta.get("source") or {}).get("exported_at"),
+        "stale": aviso is not None,
+        "local_index_bytes": index.size_bytes(),
+        "chroma_p50_ms": _ms(lat_chroma, 50),
+        "chroma_p95_ms": _ms(lat_chroma, 95),
+        "local_p50_ms": _ms(lat_local, 50),
+        "local_p95_ms": _ms(lat_local, 95),
+        "recall_at_k": float(np.mean(recalls)) if recalls else None,
+    }
+
+
+# ---------------- MAIN ----------------
+
+def entero_no_negativo(valor):
+    """
+    Tipo de argparse para --nlist: entero >= 0.
+    """
+    numero = int(valor)
+    if numero < 0:
+        raise argparse.ArgumentTypeError(f"debe ser >= 0 (recibido {numero})")
+    return numero
+
+
+if __name__ == "__main__":
+    from KnowledgeBase_runtime import get_db, get_embedding, get_local_index_nprobe, get_local_index_path
+
+    parser = argparse.ArgumentParser(
+        description="Índice vectorial local (memmap NumPy) como alternativa a Chroma"
+    )
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_export = sub.add_parser("export", help="Exportar la colección de Chroma al índice local")
+    p_export.add_argument("--dtype", choices=DTYPES, default="float32")
+    p_export.add_argument("--nlist", type=entero_no_negativo, default=0, help="Listas IVF (0 = búsqueda exacta)")
+    p_export.add_argument("--path", help="Carpeta del índice local")
+
+    p_import = sub.add_parser("import", help="Importar el índice local a la colección de Chroma")
+    p_import.add_argument("--path", help="Carpeta del índice local")
+
+    p_compare = sub.add_parser("compare", help="Comparar latencia, tamaño y recall con Chroma")
+    p_compare.add_argument("queries", nargs="+", help="Consultas de prueba")
+    p_compare.add_argument("--k", type=int, default=10)
+    p_compare.add_argument("--nprobe", type=int, default=None)
+    p_compare.add_argument("--path", help="Carpeta del índice local")
+    p_compare.add_argument("--output", help="Fichero JSON de salida (por defecto stdout)")
+
+    args = parser.parse_args()
+    ruta = args.path or get_local_index_path()
+
+    if args.comando == "export":
+        index = export_from_chroma(get_db(), ruta, dtype=args.dtype, nlist=args.nlist)
+        print(f"✅ Índice local creado → {ruta} ({index.count} vectores, {index.dtype})")
+
+    elif args.comando == "import":
+        total = import_to_chroma(LocalVectorIndex(ruta), get_db())
+        print(f"✅ {total} vectores importados en Chroma")
+
+    elif args.comando == "compare":
+        informe = compare_with_chroma(
+            get_db(), LocalVectorIndex(ruta), get_embedding(),
+            args.queries, k=args.k, nprobe=args.nprobe or get_local_index_nprobe()
+        )
+        salida = json.dumps(informe, ensure_ascii=False, indent=2)
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(salida)
+        else:
+            print(salida)
@@ -2,12 +2,14 @@ import pandas as pd
 import os
 import json
 import argparse
+from Tools_metrics import incr, span, timed
 
 # Base paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PROCESSED_PATH = os.path.join(BASE_DIR, "Data", "Data processed")
 
 
+@timed("consultar_csv")
 def consultar_csv(nombre_archivo, consulta_tipo, parametros=None):
     """
     Run queries over a single CSV file.
@@ -24,7 +26,10 @@ def consultar_csv(nombre_archivo, consulta_tipo, parametros=None):
         else:
             raise FileNotFoundError(f"CSV file not found: {ruta_csv}")
 
-    df = pd.read_csv(ruta_csv)
+    with span("consultar_csv.load", file=nombre_archivo):
+        df = pd.read_csv(ruta_csv)
+
+    incr(f"consultar_csv.{consulta_tipo}")
 
     resultado = {}
 
@@ -1,33 +1,13 @@
 import os
 import shutil
-from dotenv import load_dotenv
 from langchain_chroma import Chroma
-from langchain_openai import AzureOpenAIEmbeddings
-
-# Ruta fija a la carpeta de excels
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-# Ruta fija a la carpeta de knowledge base
-KNOWLEDGE_BASE_PATH = os.path.join(BASE_DIR, "Data", "KnowledgeBase")
-ENV_PATH = os.path.join(BASE_DIR, "env", ".env.playground.user")
-
-load_dotenv(ENV_PATH)
-
-try:
-    embedding = AzureOpenAIEmbeddings(
-        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_key = os.getenv("SECRET_AZURE_OPENAI_API_KEY"),
-        azure_deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
-        chunk_size = 1,
-        check_embedding_ctx_length=False
-    )
-    print("Embedding cargado correctamente.")
-
-except Exception as e:
-    print(f"Error al cargar el embedding: {e}")
+from KnowledgeBase_runtime import get_embedding, get_persist_directory, reset_runtime
 
 def reset_chroma_db(persist_directory: str, embedding_function):
 
+    # 0️⃣ soltar la instancia de Chroma cacheada en este proceso
+    reset_runtime()
+
     # 1️⃣ borrar carpeta si existe
     if os.path.exists(persist_directory):
         shutil.rmtree(persist_directory)
@@ -53,8 +33,8 @@ if __name__ == "__main__":
 
     try:
         db = reset_chroma_db(
-            persist_directory=KNOWLEDGE_BASE_PATH,
-            embedding_function=embedding
+            persist_directory=get_persist_directory(),
+            embedding_function=get_embedding()
         )
 
         # 🔎 comprobar que está vacía
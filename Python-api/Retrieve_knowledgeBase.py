@@ -1,39 +1,19 @@
-import os
 import argparse
-from dotenv import load_dotenv
-from langchain_chroma import Chroma
-from langchain_openai import AzureOpenAIEmbeddings
-
-# Ruta fija a la carpeta de excels
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-# Ruta fija a la carpeta de knowledge base
-KNOWLEDGE_BASE_PATH = os.path.join(BASE_DIR, "Data", "KnowledgeBase")
-ENV_PATH = os.path.join(BASE_DIR, "env", ".env.playground.user")
-
-load_dotenv(ENV_PATH)
-
-try:
-    embedding = AzureOpenAIEmbeddings(
-        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_key = os.getenv("SECRET_AZURE_OPENAI_API_KEY"),
-        azure_deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
-        chunk_size = 1,
-        check_embedding_ctx_length=False
-    )
-    print("Embedding cargado correctamente.")
-
-except Exception as e:
-    print(f"Error al cargar el embedding: {e}")
+from KnowledgeBase_runtime import get_db, get_embedding, get_local_index, get_local_index_nprobe, get_retrieval_backend
+from Tools_metrics import span, timed
 
+@timed("retrieve_top_k")
 def retrieve_top_k(query: str, k: int = 10):
 
-    db = Chroma(
-        persist_directory=KNOWLEDGE_BASE_PATH,
-        embedding_function=embedding
-    )
+    backend = get_retrieval_backend()
 
-    results = db.similarity_search(query, k=k)
+    with span("retrieve.similarity_search", k=k, backend=backend):
+        if backend == "local":
+            results = get_local_index().similarity_search(
+                query, k=k, embedding=get_embedding(), nprobe=get_local_index_nprobe()
+            )
+        else:
+            results = get_db().similarity_search(query, k=k)
 
     output = []
     output.append(f"top {k} resultados:\n")
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import inspect
+import functools
+import threading
+import contextlib
+
+# Métricas desactivadas por defecto; TOOLS_METRICS=1 las activa
+_enabled = os.getenv("TOOLS_METRICS", "0").lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_counters = {}
+_spans = {}
+
+# Context manager vacío reutilizable: coste casi nulo con las métricas apagadas
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(valor: bool):
+    global _enabled
+    _enabled = bool(valor)
+
+
+def _emit(evento):
+    """
+    Escribe un evento como línea JSON en stderr (stdout lo leen los agentes).
+    """
+    sys.stderr.write(json.dumps(evento, ensure_ascii=False, default=str) + "\n")
+    sys.stderr.flush()
+
+
+@contextlib.contextmanager
+def _timed_span(name, fields):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion_ms = (time.perf_counter() - t0) * 1000
+
+        with _lock:
+            agregado = _spans.get(name)
+            if agregado is None:
+                agregado = _spans[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            agregado["count"] += 1
+            agregado["total_ms"] += duracion_ms
+            agregado["max_ms"] = max(agregado["max_ms"], duracion_ms)
+
+        _emit({"event": "span", "name": name, "duration_ms": round(duracion_ms, 3), **fields})
+
+
+def span(name: str, **fields):
+    """
+    Mide el bloque `with` y lo emite como span. No hace nada si están apagadas.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _timed_span(name, fields)
+
+
+def timed(name: str):
+    """
+    Decorador: mide cada llamada a la función como un span `name`.
+    """
+    def decorador(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with _timed_span(name, {}):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _timed_span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def incr(name: str, value=1):
+    """
+    Incrementa un contador acumulado en el proceso.
+    """
+    if not _enabled:
+        return
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+    _emit({"event": "counter", "name": name, "value": value})
+
+
+def snapshot():
+    """
+    Devuelve contadores y agregados de spans acumulados en el proceso.
+    """
+    with _lock:
+        return {
+            "enabled": _enabled,
+            "counters": dict(_counters),
+            "spans": {name: dict(agg) for name, agg in _spans.items()},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _spans.clear()
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from pydantic import BaseModel
 
 from Script_particion_excel_to_csv import partir_excel  # importamos tu función
+from Tools_metrics import snapshot
 
 app = FastAPI()
 
@@ -17,6 +18,12 @@ def health():
     return {"status": "ok"}
 
 
+# 📊 métricas acumuladas del proceso (activar con TOOLS_METRICS=1)
+@app.get("/metrics")
+def metrics():
+    return snapshot()
+
+
 # 🛠️ endpoint que llama a tu función
 @app.post("/partir-excel")
 def ejecutar_particion(request: ExcelRequest):
@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 import matplotlib
 import io
 import base64
+from Tools_metrics import incr, span, timed
 
 matplotlib.use('Agg')
 
@@ -80,6 +81,7 @@ class MatplotlibMCPServer:
 
         return data, xlabel, ylabel
 
+    @timed("create_chart")
     async def create_chart(self, args):
         try:
             # Normalize chart_type (LLM may send 'type' or 'chartType')
@@ -134,21 +136,26 @@ class MatplotlibMCPServer:
 
             plt.tight_layout()
 
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=72, bbox_inches='tight')
-            buf.seek(0)
-            image_b64 = base64.b64encode(buf.getvalue()).decode()
-            plt.close()
+            with span("create_chart.encode", chart_type=chart_type):
+                buf = io.BytesIO()
+                plt.savefig(buf, format='png', dpi=72, bbox_inches='tight')
+                buf.seek(0)
+                image_b64 = base64.b64encode(buf.getvalue()).decode()
+                plt.close()
 
             # Compress if still too large (>180KB base64 ~ 135KB binary)
             if len(image_b64) > 180000:
-                buf2 = io.BytesIO()
-                from PIL import Image
-                img = Image.open(io.BytesIO(base64.b64decode(image_b64)))
-                img = img.resize((int(img.width * 0.6), int(img.height * 0.6)), Image.LANCZOS)
-                img.save(buf2, format='PNG', optimize=True)
-                buf2.seek(0)
-                image_b64 = base64.b64encode(buf2.getvalue()).decode()
+                incr("create_chart.compressed")
+                with span("create_chart.compress", chart_type=chart_type):
+                    buf2 = io.BytesIO()
+                    from PIL import Image
+                    img = Image.open(io.BytesIO(base64.b64decode(image_b64)))
+                    img = img.resize((int(img.width * 0.6), int(img.height * 0.6)), Image.LANCZOS)
+                    img.save(buf2, format='PNG', optimize=True)
+                    buf2.seek(0)
+                    image_b64 = base64.b64encode(buf2.getvalue()).decode()
+
+            incr("create_chart.image_b64_bytes", len(image_b64))
 
             return {
                 "content": [